@@ -5,6 +5,8 @@ import json
 from time import time
 from collections import Counter
 
+import significance
+
 
 def nx_digraph_from_path(name, path) -> (str, nx.DiGraph):
     """Extract json data from @path and return its (name, nx.DiGraph) tuple"""
@@ -230,6 +232,164 @@ def get_graph_reciprocity(graphs):
     return pd.Series(recip, name='reciprocity')
 
 
+def edge_arrays(graph):
+    """
+    Get the edges of @graph as integer arrays; node i is the i-th node of
+      graph.nodes(). Parallel edges of multigraphs (eg. configuration models)
+      are repeated.
+    :param graph: nx.DiGraph or nx.MultiDiGraph
+    :return: (source array, target array, amount of nodes)
+    """
+    index = {node: i for i, node in enumerate(graph.nodes())}
+
+    # Single pass over the edges; much faster than going through
+    #   nx.to_scipy_sparse_array
+    flat = np.fromiter((index[node] for e in graph.edges() for node in e),
+                       dtype=np.int64, count=2*graph.number_of_edges())
+
+    return flat[0::2], flat[1::2], len(index)
+
+
+def edge_degree_assortativity(src, dst, n):
+    """
+    Get the 4 directed degree assortativity coefficients: the Pearson
+      correlation, over all edges u->v, of the x-degree of u and the y-degree
+      of v for x, y in {in, out}
+    :param src: edge source array from edge_arrays
+    :param dst: edge target array from edge_arrays
+    :param n: amount of nodes
+    :return: dict of {'in_in', 'in_out', 'out_in', 'out_out': coefficient};
+      nan where either degree is constant across edges
+    """
+    deg = {'in': np.bincount(dst, minlength=n),
+           'out': np.bincount(src, minlength=n)}
+
+    coeffs = dict()
+    for x in ('in', 'out'):
+        for y in ('in', 'out'):
+            a = deg[x][src].astype(float)
+            b = deg[y][dst].astype(float)
+            a -= a.mean() if a.size else 0
+            b -= b.mean() if b.size else 0
+
+            denom = np.sqrt(a.dot(a)*b.dot(b))
+            coeffs[f'{x}_{y}'] = a.dot(b)/denom if denom > 0 else np.nan
+
+    return coeffs
+
+
+def avg_neighbor_degree_by_class(src, dst, n, source='out', target='in'):
+    """
+    Get the average @target-degree of the neighbors of nodes, grouped by the
+      nodes' @source-degree; same as nx.average_degree_connectivity for
+      unweighted directed graphs, but only for degree classes with neighbors
+    :param source: 'in' or 'out'; with 'out' the neighbors are successors,
+      with 'in' they are predecessors
+    :param target: 'in' or 'out'
+    :return: Series of {degree class: average neighbor degree}
+    """
+    deg = {'in': np.bincount(dst, minlength=n),
+           'out': np.bincount(src, minlength=n)}
+    node, nbr = (src, dst) if source == 'out' else (dst, src)
+
+    k = deg[source][node]
+    nbr_sum = np.bincount(k, weights=deg[target][nbr])
+    nbr_count = np.bincount(k)
+
+    classes = np.flatnonzero(nbr_count)
+    return pd.Series(nbr_sum[classes]/nbr_count[classes], index=classes,
+                     name=f'avg_nbr_{target}_deg')
+
+
+def _undirected_simple_edges(src, dst, n):
+    """Drop self-loops and duplicate/reciprocal edges; returns (u, v) with u < v"""
+    loops = src == dst
+    u = np.minimum(src[~loops], dst[~loops])
+    v = np.maximum(src[~loops], dst[~loops])
+    uv = np.unique(u.astype(np.int64)*n + v)
+
+    return uv//n, uv % n
+
+
+def rich_club_coefficients(src, dst, n):
+    """
+    Get the (non-normalized) rich-club coefficient of the undirected,
+      simple version of the graph for every degree k; same as
+      nx.rich_club_coefficient(normalized=False)
+    :return: array where element k is the edge density between nodes of
+      degree > k, for all k with at least 2 such nodes
+    """
+    u, v = _undirected_simple_edges(src, dst, n)
+    deg = np.bincount(u, minlength=n) + np.bincount(v, minlength=n)
+
+    # Amount of nodes/edges with (smallest endpoint) degree > k for every k
+    nodes_gt = n - np.cumsum(np.bincount(deg))
+    edges_min = np.bincount(np.minimum(deg[u], deg[v]), minlength=nodes_gt.size)
+    edges_gt = u.size - np.cumsum(edges_min)
+
+    nodes_gt = nodes_gt[nodes_gt > 1]
+    edges_gt = edges_gt[:nodes_gt.size]
+    return 2*edges_gt/(nodes_gt*(nodes_gt - 1))
+
+
+def rich_club_members(src, dst, n, percentile=90):
+    """
+    Get the nodes with total (in + out) degree above its @percentile. The
+      directed configuration model keeps every node's in/out degree, so its
+      resamples have the same members as the graph they're drawn from.
+    :return: boolean array over the nodes
+    """
+    deg = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+    k = np.percentile(deg, percentile) if n else 0
+
+    return deg > k
+
+
+def rich_club_percentile_coefficient(src, dst, n, percentile=90):
+    """
+    Get the edge density of the undirected, simple version of the graph
+      between the rich_club_members
+    """
+    club = rich_club_members(src, dst, n, percentile)
+    size = np.count_nonzero(club)
+    if size < 2:
+        return np.nan
+
+    u, v = _undirected_simple_edges(src, dst, n)
+    edges = np.count_nonzero(club[u] & club[v])
+
+    return 2*edges/(size*(size - 1))
+
+
+def get_graph_degree_correlations(graphs, percentile=90):
+    """
+    Return a DataFrame of the 4 directed degree assortativity coefficients
+      (assort_in_in, assort_in_out, assort_out_in, assort_out_out) and the
+      rich-club coefficient (rich_club) of rich_club_percentile_coefficient
+    """
+    stats = dict()
+    for n, g in graphs.items():
+        # Edge arrays are the slow part, so only extracted once per graph
+        arrays = edge_arrays(g)
+        stats[n] = {f'assort_{k}': r
+                    for k, r in edge_degree_assortativity(*arrays).items()}
+        stats[n]['rich_club'] = rich_club_percentile_coefficient(*arrays,
+                                                                 percentile)
+
+    return pd.DataFrame.from_dict(stats, orient='index')
+
+
+def get_avg_neighbor_degree_by_class(graphs, source='out', target='in'):
+    """
+    Get average neighbor degree by degree class for every graph
+    :return: DataFrame of degree class (index) by graph name (columns)
+    """
+    knn = {n: avg_neighbor_degree_by_class(*edge_arrays(g), source, target)
+           for n, g in graphs.items()}
+
+    return pd.DataFrame(knn)
+
+
 def get_graph_base_stats(graphs, cos_sim_out=False):
     strongest_comps = get_subset_strongly_conn_components(graphs, True)
 
@@ -241,13 +401,55 @@ def get_graph_base_stats(graphs, cos_sim_out=False):
     recip = get_graph_reciprocity(graphs)
     similarity = graph_mean_cosine_similarity(graphs, cos_sim_out)
     modularity = graph_strongest_vs_not_assortativity(graphs)
+    degree_correlations = get_graph_degree_correlations(graphs)
 
     return pd.concat(
         [nodes_edges, density, num_pct_strongest, num_pct_deg_one,
-         pagerank_max_avg, recip, similarity, modularity],
+         pagerank_max_avg, recip, similarity, modularity,
+         degree_correlations],
+        axis=1)
+
+
+def get_null_model_stats(graphs):
+    """
+    Get the statistics compared against configuration model resamples; columns
+      match those of get_graph_base_stats
+    :param graphs: dictionary of {name: networkx graph} pairs
+    :return: DataFrame
+    """
+    strongest_comps = get_subset_strongly_conn_components(graphs, True)
+    nodes = get_graph_nodes_edges(graphs)['nodes']
+
+    num_pct_strongest = get_graph_amt_nodes_largest_strong_comp(strongest_comps, nodes)
+    num_pct_deg_one = get_graph_amt_nodes_deg_one(graphs, nodes)
+
+    return pd.concat(
+        [num_pct_strongest['pct_nodes_largest_strong_comp'],
+         num_pct_deg_one['pct_nodes_deg_one'],
+         get_pagerank_max_avg(graphs), get_graph_reciprocity(graphs),
+         get_graph_degree_correlations(graphs)],
         axis=1)
 
 
+def resample_configuration_model(graph, seeds):
+    """
+    Get get_null_model_stats of directed configuration model resamples of
+      @graph; each seed is used as the random generator seed of one resample
+      so that it can later be recreated
+    :param graph: nx.DiGraph
+    :param seeds: iterable of int seeds
+    :return: DataFrame indexed by seed
+    """
+    in_degrees = [d for _, d in graph.in_degree()]
+    out_degrees = [d for _, d in graph.out_degree()]
+
+    config_models = {
+        s: nx.directed_configuration_model(in_degrees, out_degrees, seed=s)
+        for s in seeds
+    }
+    return get_null_model_stats(config_models)
+
+
 def get_strong_comp_distrib(graphs):
     """
     Return the distribution of the nodes amongst strongly-connected components
@@ -265,19 +467,15 @@ def get_strong_comp_distrib(graphs):
 
 
 def get_p_value(params, samples, field):
-    p_vals = dict()
-
-    for sr, stat in samples.items():
-        portion_lt = params.loc[sr, field] > np.array(stat)
-        portion_gt = params.loc[sr, field] < np.array(stat)
-
-        # Use the smallest of the portion values as we're looking for min p-value
-        portion = min(sum(portion_lt), sum(portion_gt))
-
-        # 1000 was the size of the resamples -- shouldn't be hardcoded but done for sake of time
-        p_vals[sr] = portion/1000
-
-    return p_vals
+    """
+    Get the p-value of @field for each subreddit in @samples; see
+      significance.get_p_values for all fields at once
+    :param params: DataFrame of subreddit statistics
+    :param samples: dict of {subreddit: list of resampled @field values}
+    :return: dict of {subreddit: p-value}
+    """
+    subset = params.loc[list(samples.keys())]
+    return significance.get_p_values(subset, {field: samples})[field].to_dict()
 
 
 
@@ -0,0 +1,248 @@
+import json
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+import analysis
+
+
+def read_edge_delta(path) -> list:
+    """
+    Read new interactions from a json file in the same format as the networks
+      in files.PATH_NET (a list of {user: [users]} dictionaries)
+    :return: list of (source, target) edges
+    """
+    with open(path) as f:
+        js = json.load(f)
+
+    return [(u, v) for j in js for u, nbrs in j.items() for v in nbrs]
+
+
+class IncrementalGraphStats:
+    """
+    Keeps the get_graph_base_stats of a single network up to date as edges are
+      appended to it.
+
+    Node/edge counts, density, degree-one counts, reciprocity and the
+      degree and edge arrays are updated in O(delta) by update(). The rest are
+      recomputed lazily by stats(): PageRank is warm-started from the previous
+      vector, and strongly-connected components are only recomputed when an
+      added edge could have merged two of them.
+    """
+
+    def __init__(self, name, graph: nx.DiGraph, cos_sim_out=False):
+        """
+        :param graph: network; kept and modified in place by update()
+        :param cos_sim_out: cos_sim_out of analysis.get_graph_base_stats
+        """
+        self.name = name
+        self.graph = graph
+        self.cos_sim_out = cos_sim_out
+
+        self._index = {node: i for i, node in enumerate(graph.nodes())}
+        self.n = len(self._index)
+        self.m = 0
+
+        cap = max(self.n, 1)
+        self._in = np.zeros(cap, dtype=np.int64)
+        self._out = np.zeros(cap, dtype=np.int64)
+        self._comp = np.zeros(cap, dtype=np.int64)
+        self._src = np.zeros(max(graph.number_of_edges(), 1), dtype=np.int64)
+        self._dst = np.zeros_like(self._src)
+
+        for u, v in graph.edges():
+            self._append_edge(self._index[u], self._index[v])
+
+        # Degree-one nodes and amount of edges whose reverse edge also exists
+        deg = self._in[:self.n] + self._out[:self.n]
+        self.deg_one = int(np.count_nonzero(deg == 1))
+        self.mutual = sum(1 for u, v in graph.edges()
+                          if u != v and graph.has_edge(v, u))
+
+        self._pagerank = None
+        self._scc_stale = True
+        self._next_label = 0
+        self._largest_comp = set()
+        self._edges_stale = True
+        self._lazy = dict()
+
+    @classmethod
+    def from_path(cls, name, path, cos_sim_out=False):
+        """Load the network with analysis.nx_digraph_from_path"""
+        loaded = analysis.nx_digraph_from_path(name, path)
+        if loaded is None:
+            raise ValueError(f'Could not load {path}')
+
+        return cls(*loaded, cos_sim_out)
+
+    @property
+    def in_degree(self) -> np.ndarray:
+        """In-degrees, ordered as graph.nodes()"""
+        return self._in[:self.n]
+
+    @property
+    def out_degree(self) -> np.ndarray:
+        """Out-degrees, ordered as graph.nodes()"""
+        return self._out[:self.n]
+
+    @property
+    def edge_arrays(self):
+        """(source array, target array, amount of nodes) as analysis.edge_arrays"""
+        return self._src[:self.m], self._dst[:self.m], self.n
+
+    @property
+    def scc_stale(self) -> bool:
+        """Whether the strongly-connected components must be recomputed"""
+        return self._scc_stale
+
+    def _add_node(self, node) -> int:
+        i = self.n
+        if i == self._in.size:
+            self._in, self._out, self._comp = (
+                np.concatenate([a, np.zeros_like(a)])
+                for a in (self._in, self._out, self._comp))
+
+        self._index[node] = i
+        self.n += 1
+
+        # A new node is its own strongly-connected component
+        self._comp[i] = self._next_label
+        self._next_label += 1
+        return i
+
+    def _append_edge(self, i, j):
+        if self.m == self._src.size:
+            self._src = np.concatenate([self._src, np.zeros_like(self._src)])
+            self._dst = np.concatenate([self._dst, np.zeros_like(self._dst)])
+
+        self._src[self.m], self._dst[self.m] = i, j
+        self._out[i] += 1
+        self._in[j] += 1
+        self.m += 1
+
+    def update(self, edges):
+        """
+        Append new interactions to the network
+        :param edges: iterable of (source, target) edges; edges already in the
+          network are ignored
+        :return: amount of edges added
+        """
+        added = list()
+        for u, v in edges:
+            if self.graph.has_edge(u, v):
+                continue
+
+            i = self._index[u] if u in self._index else self._add_node(u)
+            j = self._index[v] if v in self._index else self._add_node(v)
+
+            # Nodes whose total degree is about to change
+            touched = {i, j}
+            before = {k: int(self._in[k] + self._out[k] == 1) for k in touched}
+
+            if u != v and self.graph.has_edge(v, u):
+                self.mutual += 2
+            self.graph.add_edge(u, v)
+            self._append_edge(i, j)
+
+            for k in touched:
+                self.deg_one += int(self._in[k] + self._out[k] == 1) - before[k]
+            added.append((i, j))
+
+        if not added:
+            return 0
+
+        self._edges_stale = True
+
+        # Adding u->v can only merge strongly-connected components if v can
+        #   reach u, which needs v to have successors and u predecessors
+        if not self._scc_stale:
+            for i, j in added:
+                if (self._comp[i] != self._comp[j]
+                        and self._out[j] > 0 and self._in[i] > 0):
+                    self._scc_stale = True
+                    break
+
+        return len(added)
+
+    def _update_components(self):
+        comps = sorted(nx.strongly_connected_components(self.graph),
+                       key=len, reverse=True)
+        for label, comp in enumerate(comps):
+            self._comp[[self._index[node] for node in comp]] = label
+
+        self._next_label = len(comps)
+        self._largest_comp = comps[0] if comps else set()
+        self._scc_stale = False
+
+    def _update_pagerank(self):
+        # Warm start from the previous vector; new nodes start at 1/n and
+        #   networkx renormalizes
+        nstart = None
+        if self._pagerank is not None:
+            nstart = {node: self._pagerank.get(node, 1/self.n)
+                      for node in self.graph.nodes()}
+
+        self._pagerank = nx.pagerank(self.graph, nstart=nstart)
+
+    def _modularity(self):
+        """
+        analysis.graph_strongest_vs_not_assortativity from the kept largest
+          component instead of recomputing the components
+        """
+        rest = set(self.graph.nodes()).difference(self._largest_comp)
+        return nx.community.modularity(self.graph, [self._largest_comp, rest])
+
+    def stats(self) -> pd.DataFrame:
+        """Get the one-row DataFrame analysis.get_graph_base_stats would return"""
+        if self._scc_stale:
+            self._update_components()
+
+        if self._edges_stale:
+            graphs = {self.name: self.graph}
+            self._update_pagerank()
+            self._lazy = analysis.edge_degree_assortativity(*self.edge_arrays)
+            self._lazy.update(
+                mean_cos_sim=analysis.graph_mean_cosine_similarity(
+                    graphs, self.cos_sim_out)[self.name],
+                modularity=self._modularity(),
+                rich_club=analysis.rich_club_percentile_coefficient(
+                    *self.edge_arrays))
+            self._edges_stale = False
+
+        lazy = self._lazy
+        pagerank = list(self._pagerank.values())
+
+        row = {
+            'nodes': self.n,
+            'edges': self.m,
+            'density': np.round(self.m/(self.n*(self.n - 1)), 6)
+            if self.n > 1 else 0,
+            'nodes_largest_strong_comp': len(self._largest_comp),
+            'pct_nodes_largest_strong_comp': len(self._largest_comp)/self.n,
+            'nodes_deg_one': self.deg_one,
+            'pct_nodes_deg_one': self.deg_one/self.n,
+            'pagerank_max': max(pagerank),
+            'pagerank_avg': np.average(pagerank),
+            'reciprocity': self.mutual/self.m if self.m else np.nan,
+            'mean_cos_sim': lazy['mean_cos_sim'],
+            'modularity': lazy['modularity'],
+        }
+        row.update({f'assort_{k}': lazy[k]
+                    for k in ('in_in', 'in_out', 'out_in', 'out_out')})
+        row['rich_club'] = lazy['rich_club']
+
+        return pd.DataFrame([row], index=[self.name])
+
+
+def update_graph_base_stats(trackers, deltas):
+    """
+    Apply edge deltas and get the updated base stats of every network
+    :param trackers: dict of {subreddit: IncrementalGraphStats}
+    :param deltas: dict of {subreddit: [(source, target) edges]}; subreddits
+      without a delta are left as they are
+    :return: DataFrame as returned by analysis.get_graph_base_stats
+    """
+    for sr, edges in deltas.items():
+        trackers[sr].update(edges)
+
+    return pd.concat([t.stats() for t in trackers.values()], axis=0)
@@ -0,0 +1,226 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+
+def null_samples_to_array(samples, index) -> np.ndarray:
+    """
+    Stack the resamples of each subreddit into a 2-D array
+    :param samples: dict of {subreddit: list of resampled values}, eg. one
+      column of workqueue.get_null_samples
+    :param index: subreddits, in the order of the array rows
+    :return: array of shape (subreddits, resamples); subreddits with fewer
+      (or no) resamples are padded with nan
+    """
+    width = max((len(samples.get(sr, ())) for sr in index), default=0)
+    arr = np.full((len(index), width), np.nan)
+
+    for i, sr in enumerate(index):
+        vals = samples.get(sr, ())
+        arr[i, :len(vals)] = vals
+
+    return arr
+
+
+def get_p_values(params, null) -> pd.DataFrame:
+    """
+    Get p-values of every subreddit's statistics against their null
+      distributions: the smaller portion of resamples below or above the
+      observed value (as analysis.get_p_value)
+    :param params: DataFrame of subreddits (index) by statistics (columns),
+      eg. from analysis.get_graph_base_stats
+    :param null: dict of {statistic: null distribution}, either as a 2-D array
+      of shape (len(params), resamples) or a dict of {subreddit: resamples};
+      nan resamples are ignored
+    :return: DataFrame of p-values for the statistics in @null; nan where a
+      subreddit has no resamples
+    """
+    fields = list(null.keys())
+    dists = [null[f] if isinstance(null[f], np.ndarray)
+             else null_samples_to_array(null[f], params.index)
+             for f in fields]
+
+    # Stack into (statistics, subreddits, resamples), padding ragged widths
+    width = max(d.shape[1] for d in dists)
+    stacked = np.full((len(fields), len(params), width), np.nan)
+    for i, d in enumerate(dists):
+        stacked[i, :, :d.shape[1]] = d
+
+    observed = params[fields].to_numpy(dtype=float).T[:, :, np.newaxis]
+
+    # Comparisons with nan are False so padded resamples aren't counted
+    below = np.count_nonzero(observed > stacked, axis=2)
+    above = np.count_nonzero(observed < stacked, axis=2)
+    size = np.count_nonzero(~np.isnan(stacked), axis=2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = np.minimum(below, above)/size
+
+    return pd.DataFrame(p.T, index=params.index, columns=fields)
+
+
+def correct_p_values(p_values, method='fdr_bh', per_statistic=True):
+    """
+    Correct p-values for multiple testing
+    :param p_values: DataFrame of subreddits by statistics, eg. from
+      get_p_values
+    :param method: 'fdr_bh' (Benjamini-Hochberg false discovery rate) or
+      'bonferroni'
+    :param per_statistic: if True, each column is a separate family of tests;
+      otherwise all the p-values are corrected together
+    :return: DataFrame of corrected p-values; nan p-values are left out of
+      the correction
+    """
+    p = p_values.to_numpy(dtype=float)
+    if not per_statistic:
+        p = p.reshape(-1, 1)
+
+    # Amount of tests in each family
+    m = np.count_nonzero(~np.isnan(p), axis=0)
+
+    if method == 'bonferroni':
+        corrected = np.minimum(p*m, 1)
+
+    elif method == 'fdr_bh':
+        # nan sorts last so the first m ranks of each column are the tests
+        order = np.argsort(p, axis=0)
+        ranked = np.take_along_axis(p, order, axis=0)
+        rank = np.arange(1, p.shape[0]+1)[:, np.newaxis]
+
+        adjusted = ranked*m/rank
+        # Enforce monotonicity from the largest p-value down; nan -> inf so
+        #   they don't propagate
+        adjusted = np.where(np.isnan(adjusted), np.inf, adjusted)
+        adjusted = np.minimum.accumulate(adjusted[::-1], axis=0)[::-1]
+        adjusted = np.where(np.isnan(ranked), np.nan, np.minimum(adjusted, 1))
+
+        corrected = np.empty_like(p)
+        np.put_along_axis(corrected, order, adjusted, axis=0)
+
+    else:
+        raise ValueError(f'Unknown correction method: {method}')
+
+    return pd.DataFrame(corrected.reshape(p_values.shape),
+                        index=p_values.index, columns=p_values.columns)
+
+
+def _bootstrap_means(values, n_boot, seed) -> np.ndarray:
+    """
+    Get @n_boot bootstrap means of each column of @values, ignoring nan
+    :return: array of shape (n_boot, columns)
+    """
+    rng = np.random.default_rng(seed)
+    n = values.shape[0]
+
+    # Each resample as the amount of times every row is drawn; the means are
+    #   then a single matrix product instead of n_boot fancy-indexed copies
+    draws = rng.integers(0, n, size=(n_boot, n))
+    draws += np.arange(n_boot)[:, np.newaxis]*n
+    counts = np.bincount(draws.ravel(), minlength=n_boot*n)
+    counts = counts.reshape(n_boot, n).astype(float)
+    present = ~np.isnan(values)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (counts @ np.where(present, values, 0))/(counts @ present.astype(float))
+
+
+def _quantiles(boot, q):
+    """np.nanquantile along resamples; much slower so only used if needed"""
+    if np.isnan(boot).any():
+        return np.nanquantile(boot, q, axis=0)
+    return np.quantile(boot, q, axis=0)
+
+
+def _get_category_bootstraps(params, stats, group, n_boot, seed, n_jobs):
+    """Get dict of {category: _bootstrap_means array} in sorted category order"""
+    categories = sorted(params[group].unique())
+    values = [params.loc[params[group] == c, stats].to_numpy(dtype=float)
+              for c in categories]
+
+    # Independent streams per category so results don't depend on @n_jobs
+    seeds = np.random.SeedSequence(seed).spawn(len(categories))
+    args = (values, [n_boot]*len(categories), seeds)
+
+    if n_jobs == 1:
+        boots = list(map(_bootstrap_means, *args))
+    else:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            boots = list(pool.map(_bootstrap_means, *args))
+
+    return dict(zip(categories, boots))
+
+
+def bootstrap_category_means(params, stats, group='group', n_boot=10000,
+                             ci=0.95, seed=None, n_jobs=1) -> pd.DataFrame:
+    """
+    Get bootstrap confidence intervals for the mean of each statistic in each
+      category
+    :param params: DataFrame of subreddits with a @group column, eg. the
+      concatenated get_graph_base_stats of every category
+    :param stats: statistics (columns) to bootstrap
+    :param group: column with the category of each subreddit
+    :param n_boot: amount of bootstrap resamples
+    :param ci: confidence level of the percentile intervals
+    :param seed: seed to make the resamples reproducible
+    :param n_jobs: amount of processes to resample categories in; None uses
+      all CPUs
+    :return: DataFrame indexed by (category, statistic) with columns mean,
+      ci_low, ci_high
+    """
+    stats = list(stats)
+    boots = _get_category_bootstraps(params, stats, group, n_boot, seed, n_jobs)
+    tails = [(1 - ci)/2, (1 + ci)/2]
+
+    frames = dict()
+    for c, boot in boots.items():
+        low, high = _quantiles(boot, tails)
+        frames[c] = pd.DataFrame({
+            'mean': params.loc[params[group] == c, stats].mean(),
+            'ci_low': low,
+            'ci_high': high,
+        }, index=stats)
+
+    return pd.concat(frames, names=[group, 'statistic'])
+
+
+def bootstrap_category_differences(params, stats, group='group', pairs=None,
+                                   n_boot=10000, ci=0.95, seed=None,
+                                   n_jobs=1) -> pd.DataFrame:
+    """
+    Get bootstrap confidence intervals and p-values for the difference of
+      means between categories; the categories are resampled independently
+    :param pairs: (optional) list of (category, category) pairs; defaults to
+      every pair of categories
+    :return: DataFrame indexed by (category_a, category_b, statistic) with
+      columns diff (mean of a - mean of b), ci_low, ci_high, p_value (two-sided,
+      for a difference of 0)
+    """
+    stats = list(stats)
+    boots = _get_category_bootstraps(params, stats, group, n_boot, seed, n_jobs)
+    means = params.groupby(group)[stats].mean()
+    tails = [(1 - ci)/2, (1 + ci)/2]
+
+    if pairs is None:
+        pairs = list(combinations(boots.keys(), 2))
+
+    frames = dict()
+    for a, b in pairs:
+        diffs = boots[a] - boots[b]
+        low, high = _quantiles(diffs, tails)
+
+        # Share of resampled differences on either side of 0
+        valid = np.count_nonzero(~np.isnan(diffs), axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            p = 2*np.minimum(np.count_nonzero(diffs <= 0, axis=0),
+                             np.count_nonzero(diffs >= 0, axis=0))/valid
+
+        frames[(a, b)] = pd.DataFrame({
+            'diff': means.loc[a] - means.loc[b],
+            'ci_low': low,
+            'ci_high': high,
+            'p_value': np.minimum(p, 1),
+        }, index=stats)
+
+    return pd.concat(frames, names=[f'{group}_a', f'{group}_b', 'statistic'])
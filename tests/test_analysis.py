@@ -0,0 +1,105 @@
+import networkx as nx
+import numpy as np
+import pytest
+import analysis
+
+
+@pytest.fixture
+def graphs() -> dict:
+    """Random directed networks, one with reciprocal edges and a self-loop"""
+    sparse = nx.gnp_random_graph(60, 0.05, seed=1, directed=True)
+    dense = nx.gnp_random_graph(40, 0.2, seed=2, directed=True)
+    dense.add_edge(3, 3)
+
+    return {'sparse': sparse, 'dense': dense}
+
+
+@pytest.mark.parametrize('x', ['in', 'out'])
+@pytest.mark.parametrize('y', ['in', 'out'])
+def test_edge_degree_assortativity(graphs, x, y):
+    for g in graphs.values():
+        assort = analysis.edge_degree_assortativity(*analysis.edge_arrays(g))
+        expected = nx.degree_pearson_correlation_coefficient(g, x=x, y=y)
+
+        assert assort[f'{x}_{y}'] == pytest.approx(expected)
+
+
+def test_edge_degree_assortativity_constant_degree():
+    cycle = nx.cycle_graph(5, create_using=nx.DiGraph)
+    assort = analysis.edge_degree_assortativity(*analysis.edge_arrays(cycle))
+
+    assert all(np.isnan(r) for r in assort.values())
+
+
+@pytest.mark.parametrize('source', ['in', 'out'])
+@pytest.mark.parametrize('target', ['in', 'out'])
+def test_avg_neighbor_degree_by_class(graphs, source, target):
+    for g in graphs.values():
+        knn = analysis.avg_neighbor_degree_by_class(
+            *analysis.edge_arrays(g), source, target)
+        expected = nx.average_degree_connectivity(g, source, target)
+
+        assert set(knn.index) == {k for k in expected if k > 0}
+        for k, avg in knn.items():
+            assert avg == pytest.approx(expected[k])
+
+
+def test_rich_club_coefficients(graphs):
+    for g in graphs.values():
+        rc = analysis.rich_club_coefficients(*analysis.edge_arrays(g))
+
+        simple = nx.Graph(g)
+        simple.remove_edges_from(nx.selfloop_edges(simple))
+        expected = nx.rich_club_coefficient(simple, normalized=False)
+
+        np.testing.assert_allclose(rc, [expected[k] for k in range(len(expected))])
+
+
+def test_rich_club_members_fixed_across_resamples():
+    # Mostly reciprocal edges, which configuration model resamples lose
+    g = nx.gnp_random_graph(400, 0.02, seed=5, directed=True)
+    g.add_edges_from([(v, u) for u, v in list(g.edges()) if u % 3])
+
+    observed = analysis.rich_club_members(*analysis.edge_arrays(g))
+    assert 1 < observed.sum() < len(g)
+
+    in_degrees = [d for _, d in g.in_degree()]
+    out_degrees = [d for _, d in g.out_degree()]
+    for seed in range(3):
+        resample = nx.directed_configuration_model(in_degrees, out_degrees,
+                                                   seed=seed)
+        club = analysis.rich_club_members(*analysis.edge_arrays(resample))
+        np.testing.assert_array_equal(club, observed)
+
+
+def test_rich_club_percentile_coefficient(graphs):
+    for g in graphs.values():
+        src, dst, n = analysis.edge_arrays(g)
+        club = analysis.rich_club_members(src, dst, n)
+        members = [node for node, rich in zip(g.nodes(), club) if rich]
+
+        sub = nx.Graph(g.subgraph(members))
+        sub.remove_edges_from(nx.selfloop_edges(sub))
+        assert analysis.rich_club_percentile_coefficient(src, dst, n) == \
+            pytest.approx(nx.density(sub))
+
+
+def test_edge_arrays_multigraph():
+    g = nx.MultiDiGraph([('a', 'b'), ('a', 'b'), ('b', 'c')])
+    src, dst, n = analysis.edge_arrays(g)
+
+    assert n == 3
+    assert sorted(zip(src.tolist(), dst.tolist())) == [(0, 1), (0, 1), (1, 2)]
+
+
+def test_base_and_null_model_stats_columns(graphs):
+    assort_cols = ['assort_in_in', 'assort_in_out', 'assort_out_in',
+                   'assort_out_out', 'rich_club']
+
+    stats = analysis.get_graph_base_stats(graphs)
+    null = analysis.resample_configuration_model(graphs['sparse'], range(3))
+
+    assert set(assort_cols) <= set(stats.columns)
+    assert set(null.columns) <= set(stats.columns)
+    assert set(assort_cols) <= set(null.columns)
+    assert len(null) == 3
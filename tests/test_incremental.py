@@ -0,0 +1,124 @@
+import json
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+import analysis
+import incremental
+
+
+def split_edges(seed, n=50, p=0.06):
+    """Random network's edges split into an initial graph and two deltas"""
+    g = nx.gnp_random_graph(n, p, seed=seed, directed=True)
+    edges = [(f'u{u}', f'u{v}') for u, v in g.edges()]
+    rng = np.random.default_rng(seed)
+    rng.shuffle(edges)
+
+    a, b = len(edges)//2, 3*len(edges)//4
+    return edges[:a], edges[a:b], edges[b:]
+
+
+def assert_same_stats(stats, graph, name):
+    expected = analysis.get_graph_base_stats({name: graph})
+    expected['nodes_deg_one'] = expected['nodes_deg_one'].fillna(0)
+
+    # nx.pagerank stops once an iteration's l1 change is below N*tol, which
+    #   puts each vector within alpha/(1-alpha)*N*tol of the fixed point; the
+    #   warm- and cold-started vectors are only that close to each other
+    alpha, tol = 0.85, 1e-6
+    bound = 2*alpha/(1 - alpha)*graph.number_of_nodes()*tol
+    pagerank = ['pagerank_max', 'pagerank_avg']
+    np.testing.assert_allclose(stats[pagerank], expected[pagerank], rtol=0,
+                               atol=bound)
+
+    pd.testing.assert_frame_equal(stats[expected.columns.drop(pagerank)],
+                                  expected.drop(columns=pagerank),
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_update_matches_rebuild(seed):
+    initial, delta1, delta2 = split_edges(seed)
+    tracker = incremental.IncrementalGraphStats('sr', nx.DiGraph(initial))
+    assert_same_stats(tracker.stats(), nx.DiGraph(initial), 'sr')
+
+    for delta in (delta1, delta2):
+        tracker.update(delta)
+        initial = initial + delta
+
+        rebuilt = nx.DiGraph(initial)
+        assert_same_stats(tracker.stats(), rebuilt, 'sr')
+
+        assert list(tracker.graph.nodes()) == list(rebuilt.nodes())
+        np.testing.assert_array_equal(
+            tracker.in_degree, [d for _, d in rebuilt.in_degree()])
+        np.testing.assert_array_equal(
+            tracker.out_degree, [d for _, d in rebuilt.out_degree()])
+
+
+def test_update_ignores_existing_edges():
+    tracker = incremental.IncrementalGraphStats(
+        'sr', nx.DiGraph([('a', 'b'), ('b', 'c')]))
+
+    assert tracker.update([('a', 'b'), ('b', 'a'), ('b', 'a')]) == 1
+    assert tracker.m == 3
+    assert tracker.mutual == 2
+    assert tracker.deg_one == 1
+
+
+def test_scc_only_marked_when_delta_can_merge():
+    tracker = incremental.IncrementalGraphStats(
+        'sr', nx.DiGraph([('a', 'b'), ('b', 'a'), ('b', 'c')]))
+    tracker.stats()
+    assert not tracker.scc_stale
+
+    # New leaves and edges inside a component can't merge components
+    tracker.update([('c', 'd'), ('e', 'a'), ('a', 'a')])
+    assert not tracker.scc_stale
+    assert tracker.stats().loc['sr', 'nodes_largest_strong_comp'] == 2
+
+    # d -> e closes the cycle a -> b -> c -> d -> e -> a
+    tracker.update([('d', 'e')])
+    assert tracker.scc_stale
+    assert tracker.stats().loc['sr', 'nodes_largest_strong_comp'] == 5
+
+
+def test_scc_not_recomputed_for_leaf_delta(monkeypatch):
+    tracker = incremental.IncrementalGraphStats(
+        'sr', nx.DiGraph([('a', 'b'), ('b', 'a'), ('b', 'c')]))
+    before = tracker.stats()
+
+    calls = list()
+    scc = nx.strongly_connected_components
+
+    def spy(graph):
+        calls.append(graph)
+        return scc(graph)
+
+    monkeypatch.setattr(nx, 'strongly_connected_components', spy)
+
+    tracker.update([('c', 'd')])
+    after = tracker.stats()
+
+    assert calls == []
+    assert after.loc['sr', 'modularity'] != before.loc['sr', 'modularity']
+    assert_same_stats(after, tracker.graph.copy(), 'sr')
+
+
+def test_update_graph_base_stats(tmp_path):
+    initial, delta, _ = split_edges(3)
+    path = tmp_path/'sr.json'
+    adjacency = dict()
+    for u, v in delta:
+        adjacency.setdefault(u, list()).append(v)
+    with open(path, 'w') as f:
+        json.dump([adjacency], f)
+
+    trackers = {'sr': incremental.IncrementalGraphStats('sr', nx.DiGraph(initial)),
+                'other': incremental.IncrementalGraphStats(
+                    'other', nx.DiGraph(split_edges(4)[0]))}
+    stats = incremental.update_graph_base_stats(
+        trackers, {'sr': incremental.read_edge_delta(path)})
+
+    assert list(stats.index) == ['sr', 'other']
+    assert_same_stats(stats.loc[['sr']], nx.DiGraph(initial + delta), 'sr')
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import false_discovery_control
+import significance
+
+
+@pytest.fixture
+def params() -> pd.DataFrame:
+    """Random per-subreddit statistics for 3 categories"""
+    rng = np.random.default_rng(0)
+    srs = [f'sr{i}' for i in range(30)]
+
+    df = pd.DataFrame(rng.normal(size=(30, 3)), index=srs,
+                      columns=['reciprocity', 'pagerank_max', 'rich_club'])
+    df['group'] = ['news']*10 + ['sports']*10 + ['music']*10
+    df.loc[df['group'] == 'news', 'reciprocity'] += 3
+    df.loc['sr0', 'rich_club'] = np.nan
+
+    return df
+
+
+@pytest.fixture
+def null(params) -> dict:
+    rng = np.random.default_rng(1)
+    return {'reciprocity': rng.normal(size=(len(params), 200)),
+            'pagerank_max': rng.normal(size=(len(params), 200))}
+
+
+def test_get_p_values_matches_loop(params, null):
+    p = significance.get_p_values(params, null)
+
+    for field, dist in null.items():
+        for i, sr in enumerate(params.index):
+            obs = params.loc[sr, field]
+            expected = min(np.sum(obs > dist[i]), np.sum(obs < dist[i]))/dist.shape[1]
+            assert p.loc[sr, field] == pytest.approx(expected)
+
+
+def test_get_p_values_ragged_samples(params):
+    samples = {'sr1': [0.0, 1.0, 2.0, 3.0], 'sr2': [-1.0, 0.0]}
+    params = params.copy()
+    params.loc[['sr1', 'sr2'], 'reciprocity'] = 0.5
+
+    p = significance.get_p_values(params, {'reciprocity': samples})
+
+    assert p.loc['sr1', 'reciprocity'] == pytest.approx(1/4)
+    assert p.loc['sr2', 'reciprocity'] == pytest.approx(0)
+    assert p['reciprocity'].drop(['sr1', 'sr2']).isna().all()
+
+
+@pytest.mark.parametrize('per_statistic', [True, False])
+def test_correct_p_values(per_statistic):
+    rng = np.random.default_rng(2)
+    p = pd.DataFrame(rng.uniform(size=(50, 4))**2)
+    p.iloc[3, 1] = np.nan
+
+    bh = significance.correct_p_values(p, 'fdr_bh', per_statistic)
+    bonf = significance.correct_p_values(p, 'bonferroni', per_statistic)
+
+    assert np.isnan(bh.iloc[3, 1]) and np.isnan(bonf.iloc[3, 1])
+
+    families = [p[c] for c in p.columns] if per_statistic else [p.stack()]
+    for fam in families:
+        fam = fam.dropna()
+        expected = false_discovery_control(fam.to_numpy())
+        actual = bh.stack().loc[fam.index] if not per_statistic \
+            else bh.loc[fam.index, fam.name]
+
+        np.testing.assert_allclose(actual, expected)
+        assert (bonf.stack().loc[fam.index] if not per_statistic
+                else bonf.loc[fam.index, fam.name]).equals(
+            np.minimum(fam*len(fam), 1))
+
+
+def test_correct_p_values_unknown_method():
+    with pytest.raises(ValueError):
+        significance.correct_p_values(pd.DataFrame([[0.1]]), 'holm')
+
+
+def test_bootstrap_category_means(params):
+    stats = ['reciprocity', 'rich_club']
+    ci = significance.bootstrap_category_means(params, stats, n_boot=2000, seed=3)
+
+    assert list(ci.index.names) == ['group', 'statistic']
+    assert len(ci) == 3*2
+    assert (ci['ci_low'] <= ci['mean']).all() and (ci['mean'] <= ci['ci_high']).all()
+
+    # nan values are ignored rather than making the category mean nan
+    assert ci.loc[('news', 'rich_club')].notna().all()
+
+    parallel = significance.bootstrap_category_means(params, stats, n_boot=2000,
+                                                     seed=3, n_jobs=2)
+    pd.testing.assert_frame_equal(ci, parallel)
+
+
+def test_bootstrap_category_differences(params):
+    diffs = significance.bootstrap_category_differences(
+        params, ['reciprocity', 'pagerank_max'], n_boot=2000, seed=4)
+
+    assert len(diffs) == 3*2
+    news = diffs.loc[('music', 'news', 'reciprocity')]
+    assert news['diff'] < 0 and news['ci_high'] < 0
+    assert news['p_value'] < 0.01
+
+    pair = significance.bootstrap_category_differences(
+        params, ['reciprocity'], pairs=[('news', 'sports')], n_boot=2000, seed=4)
+    assert list(pair.index) == [('news', 'sports', 'reciprocity')]
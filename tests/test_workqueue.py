@@ -0,0 +1,183 @@
+import json
+import multiprocessing as mp
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+import analysis
+import workqueue
+
+
+@pytest.fixture
+def network_paths(tmp_path) -> dict:
+    """Write a few small random networks in the chain-network json format"""
+    nets = tmp_path/'chain-networks'
+    nets.mkdir()
+
+    paths = dict()
+    for i, sr in enumerate(['askreddit', 'politics', 'gaming']):
+        g = nx.gnp_random_graph(30, 0.08, seed=i, directed=True)
+        adj = {str(u): [str(v) for v in g.successors(u)] for u in g.nodes()}
+
+        paths[sr] = nets/f'{sr}.json'
+        with open(paths[sr], 'w') as f:
+            json.dump([adj], f)
+
+    return paths
+
+
+def test_add_units_idempotent(tmp_path, network_paths):
+    queue = tmp_path/'queue'
+
+    added = workqueue.add_units(queue, network_paths, n_samples=10, chunk_size=4)
+    again = workqueue.add_units(queue, network_paths, n_samples=10, chunk_size=4)
+
+    # 1 base stats unit + seed chunks [0,4), [4,8), [8,10) per subreddit
+    assert added == 3*4
+    assert again == 0
+    assert workqueue.get_status_counts(queue) == {workqueue.PENDING: 12}
+
+
+def test_add_units_extends_resamples(tmp_path, network_paths):
+    queue = tmp_path/'queue'
+    workqueue.add_units(queue, network_paths, n_samples=10, chunk_size=4)
+
+    # Seeds 0..9 are already queued, whatever the chunking
+    assert workqueue.add_units(queue, network_paths, n_samples=10,
+                               chunk_size=5) == 0
+
+    # New chunks [10, 14), [14, 18), [18, 20) for each subreddit
+    assert workqueue.add_units(queue, network_paths, n_samples=20,
+                               chunk_size=4) == 3*3
+
+    workqueue.run_worker(queue, 'w', poll=0.1)
+    samples = workqueue.get_null_samples(queue)
+
+    graph = analysis.nx_digraph_from_path('politics',
+                                          network_paths['politics'])[1]
+    expected = analysis.resample_configuration_model(graph, range(20))
+    np.testing.assert_allclose(samples['reciprocity']['politics'],
+                               expected['reciprocity'])
+
+
+def test_add_units_rejects_different_path(tmp_path, network_paths):
+    queue = tmp_path/'queue'
+    workqueue.add_units(queue, network_paths, n_samples=4)
+
+    with pytest.raises(ValueError):
+        workqueue.add_units(queue, {'politics': network_paths['gaming']},
+                            n_samples=8)
+
+    assert workqueue.get_status_counts(queue) == {workqueue.PENDING: 3*2}
+
+
+def test_worker_on_other_mount_point(tmp_path, network_paths):
+    # The adding host sees the shared directory through a symlinked mount
+    shared = tmp_path/'shared'
+    shared.mkdir()
+    (tmp_path/'chain-networks').rename(shared/'chain-networks')
+    host_a = tmp_path/'host-a'
+    host_a.symlink_to(shared, target_is_directory=True)
+
+    paths = {sr: host_a/'chain-networks'/p.name
+             for sr, p in network_paths.items()}
+    workqueue.add_units(host_a/'queue', paths, n_samples=2)
+
+    # The worker's host has the shared directory somewhere else entirely
+    elsewhere = tmp_path/'elsewhere'
+    shared.rename(elsewhere)
+    host_b = tmp_path/'host-b'
+    host_b.symlink_to(elsewhere, target_is_directory=True)
+
+    done = workqueue.run_worker(host_b/'queue', 'host-b', poll=0.1)
+
+    assert done == 3*2
+    assert workqueue.get_status_counts(host_b/'queue') == {workqueue.DONE: 3*2}
+
+
+def test_get_null_samples_drops_duplicate_seeds(tmp_path, network_paths):
+    queue = tmp_path/'queue'
+    paths = {'politics': network_paths['politics']}
+    workqueue.add_units(queue, paths, n_samples=10, chunk_size=4,
+                        base_stats=False)
+
+    # Overlapping ranges queued by hand, as add_units now refuses to
+    conn = workqueue._connect(queue)
+    conn.execute(
+        'INSERT INTO units (subreddit, path, task, seed_start, seed_stop) '
+        'VALUES (?, ?, ?, ?, ?)',
+        ('politics', str(paths['politics']), workqueue.TASK_NULL_MODEL, 0, 5))
+    conn.close()
+
+    workqueue.run_worker(queue, 'w', poll=0.1)
+    samples = workqueue.get_null_samples(queue)
+
+    graph = analysis.nx_digraph_from_path('politics', paths['politics'])[1]
+    expected = analysis.resample_configuration_model(graph, range(10))
+    np.testing.assert_allclose(samples['reciprocity']['politics'],
+                               expected['reciprocity'])
+
+
+def test_local_workers_merge(tmp_path, network_paths):
+    queue = tmp_path/'queue'
+    workqueue.add_units(queue, network_paths, n_samples=6, chunk_size=2)
+
+    workers = [
+        mp.Process(target=workqueue.run_worker, args=(queue, f'w{i}'),
+                   kwargs={'poll': 0.1})
+        for i in range(3)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(timeout=120)
+        assert w.exitcode == 0
+
+    assert workqueue.get_status_counts(queue) == {workqueue.DONE: 3*4}
+
+    graphs = dict(analysis.nx_digraph_from_path(sr, p)
+                  for sr, p in network_paths.items())
+
+    expected = analysis.get_graph_base_stats(graphs)
+    stats = workqueue.get_base_stats(queue).loc[expected.index, expected.columns]
+    pd.testing.assert_frame_equal(stats, expected, check_dtype=False)
+
+    samples = workqueue.get_null_samples(queue)
+    for sr, g in graphs.items():
+        resampled = analysis.resample_configuration_model(g, range(6))
+        for col in resampled.columns:
+            np.testing.assert_allclose(samples[col][sr], resampled[col])
+
+    p_vals = analysis.get_p_value(stats, samples['reciprocity'], 'reciprocity')
+    assert set(p_vals) == set(graphs)
+    assert all(0 <= p <= 0.5 for p in p_vals.values())
+
+
+def test_dead_worker_unit_is_retried(tmp_path, network_paths):
+    queue = tmp_path/'queue'
+    workqueue.add_units(queue, {'politics': network_paths['politics']},
+                        n_samples=0)
+
+    # Worker claims the unit and dies without heartbeats or completing it
+    dead = workqueue.claim_unit(queue, 'dead', lease=0.2)
+    assert dead is not None
+    assert workqueue.claim_unit(queue, 'alive', lease=0.2) is None
+
+    done = workqueue.run_worker(queue, 'alive', lease=0.2, poll=0.1)
+    assert done == 1
+
+    # The dead worker can no longer report on the reclaimed unit
+    assert not workqueue.heartbeat(queue, dead['id'], 'dead')
+    assert not workqueue.complete_unit(queue, dead['id'], 'dead', {})
+    assert workqueue.get_status_counts(queue) == {workqueue.DONE: 1}
+
+
+def test_failing_unit_gives_up(tmp_path, network_paths):
+    queue = tmp_path/'queue'
+    missing = {'missing': tmp_path/'does-not-exist.json'}
+    workqueue.add_units(queue, missing, n_samples=0)
+
+    done = workqueue.run_worker(queue, 'w', poll=0.1, max_attempts=2)
+
+    assert done == 0
+    assert workqueue.get_status_counts(queue) == {workqueue.FAILED: 1}
@@ -0,0 +1,376 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+from pathlib import Path
+from time import time, sleep
+
+import pandas as pd
+
+import analysis
+
+
+# Work queue shared between any number of worker processes/hosts. The queue is
+#   a SQLite database on a shared directory; a unit of work is a
+#   (subreddit, task, seed range) row which a worker claims, keeps alive with
+#   heartbeats, and completes with a JSON result. Units whose heartbeat is
+#   older than the lease (ie. the worker died) are handed out again.
+#
+# NOTE: leases are compared against time() of the claiming host, so the hosts'
+#   clocks should be kept in sync (eg. NTP) to within a fraction of the lease.
+
+QUEUE_NAME = 'queue.sqlite'
+
+TASK_BASE_STATS = 'base_stats'
+TASK_NULL_MODEL = 'null_model'
+
+PENDING = 'pending'
+CLAIMED = 'claimed'
+DONE = 'done'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY,
+    subreddit TEXT NOT NULL,
+    path TEXT NOT NULL,
+    task TEXT NOT NULL,
+    seed_start INTEGER NOT NULL,
+    seed_stop INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    heartbeat REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    UNIQUE (subreddit, task, seed_start, seed_stop)
+)
+"""
+
+
+def _connect(path, timeout=60.0) -> sqlite3.Connection:
+    """Open the queue database in @path (the shared directory)"""
+    # Autocommit mode; transactions are opened explicitly where needed
+    conn = sqlite3.connect(Path(path)/QUEUE_NAME, timeout=timeout,
+                           isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def create_queue(path):
+    """Create the queue database inside directory @path if it doesn't exist"""
+    Path(path).mkdir(parents=True, exist_ok=True)
+    conn = _connect(path)
+    try:
+        conn.execute(_SCHEMA)
+    finally:
+        conn.close()
+
+
+def add_units(path, network_paths, n_samples=1000, chunk_size=50,
+              base_stats=True) -> int:
+    """
+    Split the work for @network_paths into units and add them to the queue;
+      seeds already queued for a subreddit are skipped, so this can be re-run
+      with a larger @n_samples to add more resamples
+    :param path: shared queue directory
+    :param network_paths: dict of {subreddit: subreddit network path}, as
+      returned by files.get_network_paths(); stored relative to @path so
+      hosts can mount the shared directory in different places
+    :param n_samples: amount of configuration model resamples per subreddit;
+      seeds 0..n_samples-1 are used
+    :param chunk_size: amount of resamples in a single new unit
+    :param base_stats: whether to also add a get_graph_base_stats unit for
+      each subreddit
+    :return: amount of newly added units
+    :raises ValueError: if a subreddit is already queued with a different
+      network path
+    """
+    create_queue(path)
+
+    conn = _connect(path)
+    try:
+        before = conn.total_changes
+        conn.execute('BEGIN IMMEDIATE')
+
+        # {subreddit: (network path, first seed that isn't queued yet)}
+        queued = {
+            sr: (p, stop) for sr, p, stop in conn.execute(
+                'SELECT subreddit, MIN(path), MAX(seed_stop) FROM units '
+                'GROUP BY subreddit')
+        }
+
+        rows = list()
+        for sr, p in network_paths.items():
+            p = os.path.relpath(os.path.abspath(p), os.path.abspath(path))
+            q_path, q_stop = queued.get(sr, (p, 0))
+            if q_path != p:
+                conn.execute('ROLLBACK')
+                raise ValueError(f'{sr} is already queued with {q_path}')
+
+            if base_stats:
+                rows.append((sr, p, TASK_BASE_STATS, 0, 0))
+            for start in range(q_stop, n_samples, chunk_size):
+                rows.append((sr, p, TASK_NULL_MODEL, start,
+                             min(start+chunk_size, n_samples)))
+
+        conn.executemany(
+            'INSERT OR IGNORE INTO units '
+            '(subreddit, path, task, seed_start, seed_stop) '
+            'VALUES (?, ?, ?, ?, ?)',
+            rows)
+        conn.execute('COMMIT')
+        return conn.total_changes - before
+    finally:
+        conn.close()
+
+
+def claim_unit(path, worker, lease=300.0, max_attempts=3):
+    """
+    Claim the next available unit: either a pending one or one whose worker
+      hasn't sent a heartbeat in @lease seconds
+    :return: dict of the unit's row, or None if nothing can be claimed
+    """
+    now = time()
+    conn = _connect(path)
+    try:
+        # IMMEDIATE takes the write lock up front so that two workers can't
+        #   select and claim the same unit
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            'SELECT * FROM units '
+            'WHERE (status = ? OR (status = ? AND heartbeat < ?)) '
+            'AND attempts < ? ORDER BY id LIMIT 1',
+            (PENDING, CLAIMED, now-lease, max_attempts)).fetchone()
+
+        if row is None:
+            # Give up on units that died with their worker too many times
+            conn.execute(
+                'UPDATE units SET status = ? '
+                'WHERE status = ? AND heartbeat < ? AND attempts >= ?',
+                (FAILED, CLAIMED, now-lease, max_attempts))
+            conn.execute('COMMIT')
+            return None
+
+        conn.execute(
+            'UPDATE units SET status = ?, worker = ?, heartbeat = ?, '
+            'attempts = attempts + 1 WHERE id = ?',
+            (CLAIMED, worker, now, row['id']))
+        conn.execute('COMMIT')
+
+        unit = dict(row)
+        unit.update(status=CLAIMED, worker=worker, heartbeat=now,
+                    attempts=row['attempts']+1)
+        return unit
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def heartbeat(path, unit_id, worker) -> bool:
+    """
+    Extend the lease on a claimed unit
+    :return: False if @worker no longer holds the unit (eg. it was reclaimed
+      after a missed heartbeat)
+    """
+    conn = _connect(path)
+    try:
+        cur = conn.execute(
+            'UPDATE units SET heartbeat = ? '
+            'WHERE id = ? AND worker = ? AND status = ?',
+            (time(), unit_id, worker, CLAIMED))
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def complete_unit(path, unit_id, worker, result) -> bool:
+    """
+    Store the JSON-serializable @result of a unit
+    :return: False if @worker no longer holds the unit; the result is dropped
+    """
+    conn = _connect(path)
+    try:
+        cur = conn.execute(
+            'UPDATE units SET status = ?, result = ?, error = NULL '
+            'WHERE id = ? AND worker = ? AND status = ?',
+            (DONE, json.dumps(result, default=lambda o: o.item()),
+             unit_id, worker, CLAIMED))
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def fail_unit(path, unit_id, worker, error, max_attempts=3) -> bool:
+    """Release a unit that raised @error so it can be retried"""
+    conn = _connect(path)
+    try:
+        cur = conn.execute(
+            'UPDATE units SET status = '
+            '  CASE WHEN attempts >= ? THEN ? ELSE ? END, '
+            'worker = NULL, heartbeat = NULL, error = ? '
+            'WHERE id = ? AND worker = ? AND status = ?',
+            (max_attempts, FAILED, PENDING, str(error),
+             unit_id, worker, CLAIMED))
+        return cur.rowcount == 1
+    finally:
+        conn.close()
+
+
+def get_status_counts(path) -> dict:
+    """Get dict of {unit status: amount of units}"""
+    conn = _connect(path)
+    try:
+        rows = conn.execute(
+            'SELECT status, COUNT(*) FROM units GROUP BY status').fetchall()
+        return {s: c for s, c in rows}
+    finally:
+        conn.close()
+
+
+def run_unit(unit, graph) -> dict:
+    """
+    Compute the result of @unit on the subreddit's @graph
+    :return: dict of {column: value} for TASK_BASE_STATS, or
+      {'seeds': [...], column: [values by seed]} for TASK_NULL_MODEL
+    """
+    if unit['task'] == TASK_BASE_STATS:
+        stats = analysis.get_graph_base_stats({unit['subreddit']: graph})
+        return stats.iloc[0].to_dict()
+
+    if unit['task'] == TASK_NULL_MODEL:
+        seeds = range(unit['seed_start'], unit['seed_stop'])
+        samples = analysis.resample_configuration_model(graph, seeds)
+        result = {'seeds': list(seeds)}
+        result.update({c: samples[c].tolist() for c in samples.columns})
+        return result
+
+    raise ValueError(f'Unknown task: {unit["task"]}')
+
+
+def _keep_alive(path, unit_id, worker, interval, stop: threading.Event):
+    """Send heartbeats for a unit every @interval seconds until @stop is set"""
+    while not stop.wait(interval):
+        if not heartbeat(path, unit_id, worker):
+            return
+
+
+def run_worker(path, worker=None, lease=300.0, heartbeat_interval=None,
+               poll=5.0, max_attempts=3, max_units=None) -> int:
+    """
+    Claim and run units from the queue in @path until all of them are done or
+      failed. Can be started any number of times on any host that sees the
+      shared directory.
+    :param worker: unique worker name; defaults to "<hostname>-<pid>"
+    :param lease: seconds without a heartbeat before a unit is reclaimed
+    :param heartbeat_interval: seconds between heartbeats; defaults to
+      a third of @lease
+    :param poll: seconds to wait for units claimed by other workers (which
+      may still have to be retried) before checking the queue again
+    :param max_units: (optional) stop after completing this many units
+    :return: amount of units completed by this worker
+    """
+    if worker is None:
+        worker = f'{socket.gethostname()}-{os.getpid()}'
+    if heartbeat_interval is None:
+        heartbeat_interval = lease/3
+
+    # Units are claimed in insertion order so a subreddit's units are mostly
+    #   consecutive; only the last loaded network is kept around
+    cached = (None, None)
+    completed = 0
+
+    while max_units is None or completed < max_units:
+        unit = claim_unit(path, worker, lease, max_attempts)
+
+        if unit is None:
+            counts = get_status_counts(path)
+            if counts.get(PENDING, 0) == 0 and counts.get(CLAIMED, 0) == 0:
+                break
+            sleep(poll)
+            continue
+
+        stop = threading.Event()
+        beat = threading.Thread(
+            target=_keep_alive,
+            args=(path, unit['id'], worker, heartbeat_interval, stop),
+            daemon=True)
+        beat.start()
+
+        try:
+            if cached[0] != unit['path']:
+                # Stored relative to the queue directory as this host sees it
+                graph = analysis.nx_digraph_from_path(
+                    unit['subreddit'], Path(path)/unit['path'])
+                if graph is None:
+                    raise ValueError(f'Could not load {unit["path"]}')
+                cached = (unit['path'], graph[1])
+
+            result = run_unit(unit, cached[1])
+        except Exception as e:
+            stop.set()
+            beat.join()
+            fail_unit(path, unit['id'], worker, repr(e), max_attempts)
+            continue
+
+        stop.set()
+        beat.join()
+        if complete_unit(path, unit['id'], worker, result):
+            completed += 1
+
+    return completed
+
+
+def _get_results(path, task):
+    conn = _connect(path)
+    try:
+        return conn.execute(
+            'SELECT subreddit, result FROM units '
+            'WHERE task = ? AND status = ? ORDER BY subreddit, seed_start',
+            (task, DONE)).fetchall()
+    finally:
+        conn.close()
+
+
+def get_base_stats(path) -> pd.DataFrame:
+    """
+    Merge the completed TASK_BASE_STATS units into the DataFrame that
+      analysis.get_graph_base_stats would return for all the subreddits
+    """
+    rows = {sr: json.loads(res) for sr, res in _get_results(path, TASK_BASE_STATS)}
+    stats = pd.DataFrame.from_dict(rows, orient='index')
+
+    # JSON turns the integer counts into plain numbers; restore their dtype
+    counts = ['nodes', 'edges', 'nodes_largest_strong_comp', 'nodes_deg_one']
+    present = [c for c in counts if c in stats.columns]
+    stats[present] = stats[present].astype('Int64')
+    return stats
+
+
+def get_null_samples(path) -> dict:
+    """
+    Merge the completed TASK_NULL_MODEL units into resample distributions
+    :return: dict of {column: {subreddit: [values ordered by seed]}}; each
+      inner dict is the @samples argument of analysis.get_p_value. Seeds
+      computed by more than one unit are only counted once.
+    """
+    # {subreddit: {seed: {column: value}}}
+    by_seed = dict()
+    for sr, res in _get_results(path, TASK_NULL_MODEL):
+        res = json.loads(res)
+        seeds = res.pop('seeds')
+        sr_seeds = by_seed.setdefault(sr, dict())
+        for i, seed in enumerate(seeds):
+            sr_seeds.setdefault(seed, {col: vals[i] for col, vals in res.items()})
+
+    samples = dict()
+    for sr, sr_seeds in by_seed.items():
+        for seed in sorted(sr_seeds):
+            for col, val in sr_seeds[seed].items():
+                samples.setdefault(col, dict()).setdefault(sr, list()).append(val)
+
+    return samples